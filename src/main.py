@@ -1,36 +1,112 @@
 """Main FastAPI application for YouTube to Doc MVP."""
 
+import asyncio
+import logging
+import os
+import queue
+from contextlib import asynccontextmanager
+from logging.handlers import QueueHandler, QueueListener
 from pathlib import Path
-from typing import Dict
+from typing import Any, AsyncIterator, Dict, Tuple
 
 from fastapi import FastAPI, Request, Form
-from fastapi.responses import HTMLResponse
+from fastapi.responses import HTMLResponse, StreamingResponse
 from fastapi.templating import Jinja2Templates
+from jinja2 import Environment, FileSystemLoader
 from slowapi import Limiter
 from slowapi.util import get_remote_address
 from slowapi.errors import RateLimitExceeded
 from starlette.responses import Response
 
-from .processor import process_youtube_video
+from .processor import (
+    VIDEO_UNAVAILABLE_ERRORS,
+    is_youtube_url,
+    process_youtube_video,
+)
 
-# Initialize FastAPI app
-app = FastAPI(title="YouTube to Doc MVP")
+LOG_LEVEL = os.getenv("LOG_LEVEL", "WARNING").upper()
+
+
+@asynccontextmanager
+async def lifespan(app: FastAPI) -> AsyncIterator[None]:
+    """Emit package logs from a background thread so request paths never block on stdout."""
+    level = logging.getLevelName(LOG_LEVEL)
+    if not isinstance(level, int):
+        raise ValueError(f"Invalid LOG_LEVEL: {LOG_LEVEL!r}")
 
-# Initialize rate limiter
-limiter = Limiter(key_func=get_remote_address)
+    stream_handler = logging.StreamHandler()
+    stream_handler.setFormatter(
+        logging.Formatter("%(asctime)s %(levelname)s %(name)s: %(message)s")
+    )
+    log_queue: "queue.SimpleQueue[logging.LogRecord]" = queue.SimpleQueue()
+    listener = QueueListener(log_queue, stream_handler)
+    queue_handler = QueueHandler(log_queue)
+
+    package_logger = logging.getLogger(__package__)
+    previous_level = package_logger.level
+    previous_propagate = package_logger.propagate
+    package_logger.addHandler(queue_handler)
+    package_logger.setLevel(level)
+    package_logger.propagate = False
+    listener.start()
+    try:
+        yield
+    finally:
+        listener.stop()
+        package_logger.removeHandler(queue_handler)
+        package_logger.setLevel(previous_level)
+        package_logger.propagate = previous_propagate
+
+
+# Initialize FastAPI app
+app = FastAPI(title="YouTube to Doc MVP", lifespan=lifespan)
+
+# Initialize rate limiter; point storage at Redis to share limits across workers.
+# If that storage is unreachable, fall back to per-worker in-memory limits.
+RATE_LIMIT_STORAGE_URI = os.getenv("RATE_LIMIT_STORAGE_URI", "memory://")
+limiter = Limiter(
+    key_func=get_remote_address,
+    storage_uri=RATE_LIMIT_STORAGE_URI,
+    strategy="moving-window",
+    in_memory_fallback_enabled=True,
+)
 app.state.limiter = limiter
 
+# Cap on videos processed at once across all clients
+MAX_CONCURRENT_JOBS = 16
+PROCESS_SEM = asyncio.Semaphore(MAX_CONCURRENT_JOBS)
+
+# Jobs currently running, keyed by submitted URL, so duplicate submissions share one
+_inflight: Dict[str, "asyncio.Task[Tuple[Dict[str, Any], str]]"] = {}
+
 # Setup templates
 BASE_DIR = Path(__file__).parent
 TEMPLATES_DIR = BASE_DIR / "templates"
-templates = Jinja2Templates(directory=str(TEMPLATES_DIR))
+templates = Jinja2Templates(
+    env=Environment(
+        loader=FileSystemLoader(str(TEMPLATES_DIR)),
+        autoescape=True,
+        auto_reload=False,
+    )
+)
+INDEX_TEMPLATE = templates.env.get_template("index.html")
+
+
+def _finish_job(key: str) -> None:
+    """Forget a finished job and free its concurrency slot."""
+    _inflight.pop(key, None)
+    PROCESS_SEM.release()
+
+
+def render_index(context: Dict[str, Any], status_code: int = 200) -> HTMLResponse:
+    """Render the index page from the preloaded template."""
+    return HTMLResponse(INDEX_TEMPLATE.render(context), status_code=status_code)
 
 
 @app.exception_handler(RateLimitExceeded)
 async def rate_limit_handler(request: Request, exc: RateLimitExceeded) -> Response:
     """Handle rate limit exceptions."""
-    return templates.TemplateResponse(
-        "index.html",
+    return render_index(
         {
             "request": request,
             "error_message": "Rate limit exceeded. Please try again later.",
@@ -49,8 +125,7 @@ async def health_check() -> Dict[str, str]:
 @app.get("/", response_class=HTMLResponse)
 async def home(request: Request) -> HTMLResponse:
     """Render the home page."""
-    return templates.TemplateResponse(
-        "index.html",
+    return render_index(
         {
             "request": request,
             "result": False,
@@ -60,8 +135,41 @@ async def home(request: Request) -> HTMLResponse:
 
 @app.post("/", response_class=HTMLResponse)
 @limiter.limit("10/minute")
-async def process_video(request: Request, video_url: str = Form(...)) -> HTMLResponse:
+async def process_video(request: Request, video_url: str = Form(...)) -> Response:
     """Process a YouTube video and generate documentation."""
+    # Reject malformed URLs before scheduling any work
+    if not is_youtube_url(video_url):
+        return render_index(
+            {
+                "request": request,
+                "video_url": video_url,
+                "error_message": "Invalid YouTube URL",
+                "result": False,
+            },
+            status_code=400,
+        )
+
+    key = video_url.strip()
+    task = _inflight.get(key)
+    if task is None and PROCESS_SEM.locked():
+        return render_index(
+            {
+                "request": request,
+                "video_url": video_url,
+                "error_message": "Server is busy processing other videos. Please try again shortly.",
+                "result": False,
+            },
+            status_code=503,
+        )
+
+    if task is None:
+        # Take the slot here, right after the check, so a burst cannot overshoot
+        # the cap; locked() was False, so this acquire does not wait
+        await PROCESS_SEM.acquire()
+        task = asyncio.create_task(process_youtube_video(key))
+        _inflight[key] = task
+        task.add_done_callback(lambda _: _finish_job(key))
+
     context = {
         "request": request,
         "video_url": video_url,
@@ -72,23 +180,21 @@ async def process_video(request: Request, video_url: str = Form(...)) -> HTMLRes
     }
 
     try:
-        # Process the video
-        video_info, documentation = await process_youtube_video(video_url)
+        # Shield so a disconnecting client does not cancel the job for others
+        video_info, documentation = await asyncio.shield(task)
         
         context["video_info"] = video_info
         context["content"] = documentation
         context["result"] = True
         
+    except VIDEO_UNAVAILABLE_ERRORS:
+        context["error_message"] = (
+            "Video not available. Please check that the video is public and the URL is correct."
+        )
     except Exception as e:
         context["error_message"] = f"Error processing video: {str(e)}"
-        
-        if "not available" in str(e).lower():
-            context["error_message"] = (
-                "Video not available. Please check that the video is public and the URL is correct."
-            )
-        elif "transcript" in str(e).lower():
-            context["error_message"] = (
-                "Transcript not available for this video. Try a different video or check if captions are enabled."
-            )
-
-    return templates.TemplateResponse("index.html", context)
\ No newline at end of file
+
+    # Stream the page so large documents are sent as they render
+    stream = INDEX_TEMPLATE.stream(context)
+    stream.enable_buffering(size=16)
+    return StreamingResponse(stream, media_type="text/html")
\ No newline at end of file
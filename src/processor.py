@@ -1,68 +1,262 @@
 """YouTube video processor for extracting transcripts and generating documentation."""
 
 import asyncio
+import logging
 import re
-from typing import Optional, Tuple, Dict, Any
+import threading
+import time
+from collections import OrderedDict, defaultdict
+from concurrent.futures import ThreadPoolExecutor
+from typing import Any, Awaitable, Callable, Dict, Hashable, Optional, Tuple, TypeVar
 
 try:
-    from youtube_transcript_api import YouTubeTranscriptApi
+    from youtube_transcript_api import NoTranscriptFound, YouTubeTranscriptApi
     from youtube_transcript_api.formatters import TextFormatter
 except ImportError:
+    NoTranscriptFound = None
     YouTubeTranscriptApi = None
     TextFormatter = None
 
 try:
     import yt_dlp
+    from yt_dlp.utils import DownloadError, ExtractorError
 except ImportError:
     yt_dlp = None
+    DownloadError = None
+    ExtractorError = None
 
 try:
     from pytube import YouTube
+    from pytube.exceptions import VideoUnavailable
 except ImportError:
     YouTube = None
+    VideoUnavailable = None
+
+try:
+    import tiktoken
+except ImportError:
+    tiktoken = None
+
+# Extractor errors raised to the caller when the video itself cannot be
+# fetched (see _is_video_unavailable). Empty when neither library is installed.
+VIDEO_UNAVAILABLE_ERRORS: Tuple[type, ...] = tuple(
+    e for e in (DownloadError, VideoUnavailable) if e is not None
+)
+
+logger = logging.getLogger(__name__)
+
+# Matches watch, short-link and embed URLs in a single pass
+_YT_ID_RE = re.compile(
+    r'(?:youtube\.com/(?:watch\?v=|embed/)|youtu\.be/)(?P<id>[a-zA-Z0-9_-]{11})'
+)
+
+_TEXT_FORMATTER = TextFormatter() if TextFormatter else None
+
+# Metadata only: skip format manifests and player JS decryption. With most
+# formats gone, format selection would fail, so don't treat that as an error.
+YDL_OPTS = {
+    'quiet': True,
+    'no_warnings': True,
+    'ignore_no_formats_error': True,
+    'youtube_include_dash_manifest': False,
+    'youtube_include_hls_manifest': False,
+    'extractor_args': {'youtube': {'player_skip': ['configs', 'webpage', 'js']}},
+}
+
+# YoutubeDL keeps per-instance state, so reuse one per pool thread
+_ydl_local = threading.local()
+
+
+def _get_ydl() -> "yt_dlp.YoutubeDL":
+    """Return this thread's YoutubeDL instance, creating it on first use."""
+    ydl = getattr(_ydl_local, "ydl", None)
+    if ydl is None:
+        ydl = _ydl_local.ydl = yt_dlp.YoutubeDL(YDL_OPTS)
+    return ydl
+
+
+# Bounded pool for blocking yt-dlp/pytube/transcript calls
+MAX_IO_WORKERS = 8
+_IO_POOL = ThreadPoolExecutor(max_workers=MAX_IO_WORKERS, thread_name_prefix="yt")
+_IO_SEM = asyncio.Semaphore(MAX_IO_WORKERS)
+
+T = TypeVar("T")
+
+
+class AsyncTokenBucket:
+    """Token bucket that smooths outgoing request rate to an external service."""
+
+    def __init__(self, rate: float, capacity: int) -> None:
+        self.rate = rate
+        self.capacity = capacity
+        self._tokens = float(capacity)
+        self._updated = time.monotonic()
+        self._lock = asyncio.Lock()
+
+    async def acquire(self) -> None:
+        """Wait until a token is available and consume it."""
+        async with self._lock:
+            while True:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return
+                await asyncio.sleep((1 - self._tokens) / self.rate)
+
+
+# Proactive throttles so bursts stay under YouTube's per-IP limits
+_METADATA_BUCKET = AsyncTokenBucket(rate=1.0, capacity=3)
+_TRANSCRIPT_BUCKET = AsyncTokenBucket(rate=1.0, capacity=3)
+
+
+async def _run_blocking(func: Callable[[], T], bucket: Optional[AsyncTokenBucket] = None) -> T:
+    """Run a blocking call on the I/O pool, waiting for a free slot first.
+
+    If a bucket is given, a token is taken before waiting for the slot, so
+    calls throttled on one service do not hold pool slots other services need.
+    """
+    if bucket is not None:
+        await bucket.acquire()
+    async with _IO_SEM:
+        loop = asyncio.get_running_loop()
+        return await loop.run_in_executor(_IO_POOL, func)
+
+
+# Per-process cache of successful fetches, keyed by video ID
+CACHE_TTL_SECONDS = 3600
+CACHE_MAX_ENTRIES = 256
+
+_info_cache: "OrderedDict[str, Tuple[float, Dict[str, Any]]]" = OrderedDict()
+_info_inflight: Dict[str, "asyncio.Task[Optional[Dict[str, Any]]]"] = {}
+_transcript_cache: "OrderedDict[Tuple[str, str], Tuple[float, str]]" = OrderedDict()
+_transcript_inflight: Dict[Tuple[str, str], "asyncio.Task[Optional[str]]"] = {}
+
+
+async def _cached_fetch(
+    cache: "OrderedDict[Any, Tuple[float, Any]]",
+    inflight: Dict[Any, "asyncio.Task[Any]"],
+    key: Hashable,
+    fetch: Callable[[], Awaitable[Optional[T]]],
+) -> Optional[T]:
+    """Return a cached result for key, coalescing concurrent misses into one fetch.
+
+    Only non-None results are cached so failed lookups are retried on the next request.
+    """
+    hit = cache.get(key)
+    if hit is not None:
+        stored_at, value = hit
+        if time.monotonic() - stored_at < CACHE_TTL_SECONDS:
+            cache.move_to_end(key)
+            return value
+        del cache[key]
+    
+    task = inflight.get(key)
+    if task is None:
+        task = asyncio.create_task(fetch())
+        inflight[key] = task
+        
+        def _store(done: "asyncio.Task[Any]") -> None:
+            inflight.pop(key, None)
+            if done.cancelled() or done.exception() is not None:
+                return
+            result = done.result()
+            if result is not None:
+                cache[key] = (time.monotonic(), result)
+                cache.move_to_end(key)
+                while len(cache) > CACHE_MAX_ENTRIES:
+                    cache.popitem(last=False)
+        
+        task.add_done_callback(_store)
+    
+    # Shield so one cancelled caller does not cancel the fetch for the others
+    return await asyncio.shield(task)
+
+
+def is_youtube_url(url: str) -> bool:
+    """Check whether a URL contains a recognizable YouTube video ID."""
+    return _YT_ID_RE.search(url) is not None
 
 
 def extract_video_id(url: str) -> str:
     """Extract video ID from YouTube URL."""
-    youtube_patterns = [
-        r'(?:https?://)?(?:www\.)?youtube\.com/watch\?v=([a-zA-Z0-9_-]{11})',
-        r'(?:https?://)?(?:www\.)?youtu\.be/([a-zA-Z0-9_-]{11})',
-        r'(?:https?://)?(?:www\.)?youtube\.com/embed/([a-zA-Z0-9_-]{11})',
-    ]
-    
-    for pattern in youtube_patterns:
-        match = re.search(pattern, url)
-        if match:
-            return match.group(1)
+    match = _YT_ID_RE.search(url)
+    if match:
+        return match.group('id')
     
     raise ValueError("Invalid YouTube URL")
 
 
 async def get_video_info(video_id: str, url: str) -> Dict[str, Any]:
-    """Extract video information using yt-dlp or pytube."""
+    """Get video information, served from cache when recently fetched.
+
+    Raises one of VIDEO_UNAVAILABLE_ERRORS when the video cannot be fetched.
+    """
+    info = await _cached_fetch(
+        _info_cache, _info_inflight, video_id, lambda: _fetch_video_info(video_id, url)
+    )
+    if info is not None:
+        return {**info, "url": url}
+    
+    # Return minimal info if both extractors fail
+    return {
+        "title": f"Video {video_id}",
+        "description": "Description not available",
+        "duration": 0,
+        "view_count": None,
+        "channel": "Unknown Channel",
+        "upload_date": None,
+        "url": url,
+        "video_id": video_id,
+    }
+
+
+def _is_video_unavailable(error: BaseException) -> bool:
+    """Check whether an extractor error means the video is private, removed or invalid.
+
+    yt-dlp raises DownloadError for every failure, including network errors and
+    HTTP 429, so only errors wrapping an expected ExtractorError count.
+    """
+    if VideoUnavailable is not None and isinstance(error, VideoUnavailable):
+        return True
+    if DownloadError is not None and isinstance(error, DownloadError):
+        cause = error.exc_info[1] if error.exc_info else None
+        return isinstance(cause, ExtractorError) and cause.expected
+    return False
+
+
+async def _fetch_video_info(video_id: str, url: str) -> Optional[Dict[str, Any]]:
+    """Extract video information using yt-dlp or pytube.
+
+    Returns None if both extractors fail, or raises the extractor's error if
+    either reported the video as unavailable. Transient failures such as
+    network errors or rate limiting also return None.
+    """
+    unavailable: Optional[BaseException] = None
     
     # Try yt-dlp first
     if yt_dlp:
         try:
             def extract_info():
-                ydl_opts = {'quiet': True, 'no_warnings': True}
-                with yt_dlp.YoutubeDL(ydl_opts) as ydl:
-                    info = ydl.extract_info(url, download=False)
-                    return {
-                        "title": info.get('title', 'Unknown Title'),
-                        "description": info.get('description', ''),
-                        "duration": info.get('duration', 0),
-                        "view_count": info.get('view_count'),
-                        "channel": info.get('uploader', 'Unknown Channel'),
-                        "upload_date": info.get('upload_date'),
-                        "url": url,
-                        "video_id": video_id,
-                    }
+                ydl = _get_ydl()
+                info = ydl.extract_info(url, download=False)
+                return {
+                    "title": info.get('title', 'Unknown Title'),
+                    "description": info.get('description', ''),
+                    "duration": info.get('duration', 0),
+                    "view_count": info.get('view_count'),
+                    "channel": info.get('uploader', 'Unknown Channel'),
+                    "upload_date": info.get('upload_date'),
+                    "url": url,
+                    "video_id": video_id,
+                }
             
-            loop = asyncio.get_event_loop()
-            return await loop.run_in_executor(None, extract_info)
+            return await _run_blocking(extract_info, _METADATA_BUCKET)
         except Exception as e:
-            print(f"yt-dlp failed: {e}")
+            logger.debug("yt-dlp failed for %s", video_id, exc_info=True)
+            if _is_video_unavailable(e):
+                unavailable = e
     
     # Fallback to pytube
     if YouTube:
@@ -80,63 +274,74 @@ async def get_video_info(video_id: str, url: str) -> Dict[str, Any]:
                     "video_id": yt.video_id,
                 }
             
-            loop = asyncio.get_event_loop()
-            return await loop.run_in_executor(None, extract_info)
+            return await _run_blocking(extract_info, _METADATA_BUCKET)
         except Exception as e:
-            print(f"pytube failed: {e}")
+            logger.debug("pytube failed for %s", video_id, exc_info=True)
+            if _is_video_unavailable(e):
+                unavailable = e
     
-    # Return minimal info if both fail
-    return {
-        "title": f"Video {video_id}",
-        "description": "Description not available",
-        "duration": 0,
-        "view_count": None,
-        "channel": "Unknown Channel",
-        "upload_date": None,
-        "url": url,
-        "video_id": video_id,
-    }
+    if unavailable is not None:
+        raise unavailable
+    
+    return None
+
+
+def _select_transcript(transcript_list: Any, language: str) -> Any:
+    """Pick the manual, then auto-generated, then first available transcript."""
+    manual = getattr(transcript_list, "_manually_created_transcripts", None)
+    generated = getattr(transcript_list, "_generated_transcripts", None)
+    
+    if manual is not None and generated is not None:
+        # Plain dict lookups avoid raising NoTranscriptFound on the common path
+        transcript = manual.get(language) or generated.get(language)
+        if transcript:
+            return transcript
+    else:
+        try:
+            return transcript_list.find_transcript([language])
+        except NoTranscriptFound:
+            pass
+    
+    return next(iter(transcript_list), None)
 
 
 async def get_transcript(video_id: str, language: str = "en") -> Optional[str]:
+    """Get video transcript, served from cache when recently fetched."""
+    return await _cached_fetch(
+        _transcript_cache,
+        _transcript_inflight,
+        (video_id, language),
+        lambda: _fetch_transcript(video_id, language),
+    )
+
+
+async def _fetch_transcript(video_id: str, language: str) -> Optional[str]:
     """Extract video transcript using YouTube Transcript API."""
     
-    if not YouTubeTranscriptApi or not TextFormatter:
+    if not YouTubeTranscriptApi or not _TEXT_FORMATTER:
         return None
     
+    # youtube-transcript-api is synchronous, and the caption track URLs it
+    # uses are signed from the player response, so fetching timedtext
+    # directly over httpx is not reliable; run the library on the I/O pool.
     def extract_transcript():
         try:
-            text_formatter = TextFormatter()
-            
             # Try to get transcript
             transcript_list = YouTubeTranscriptApi.list_transcripts(video_id)
             
-            # Try manual transcript first, then auto-generated
-            transcript = None
-            try:
-                transcript = transcript_list.find_manually_created_transcript([language])
-            except:
-                try:
-                    transcript = transcript_list.find_generated_transcript([language])
-                except:
-                    # Get first available transcript
-                    for t in transcript_list:
-                        transcript = t
-                        break
-            
+            transcript = _select_transcript(transcript_list, language)
             if not transcript:
                 return None
             
             # Fetch and format
             fetched = transcript.fetch()
-            return text_formatter.format_transcript(fetched)
+            return _TEXT_FORMATTER.format_transcript(fetched)
             
-        except Exception as e:
-            print(f"Transcript extraction failed: {e}")
+        except Exception:
+            logger.debug("Transcript extraction failed for %s", video_id, exc_info=True)
             return None
     
-    loop = asyncio.get_event_loop()
-    return await loop.run_in_executor(None, extract_transcript)
+    return await _run_blocking(extract_transcript, _TRANSCRIPT_BUCKET)
 
 
 def format_duration(seconds: int) -> str:
@@ -152,55 +357,107 @@ def format_duration(seconds: int) -> str:
         return f"{hours}h {minutes}m {secs}s"
 
 
-def estimate_tokens(text: str) -> int:
-    """Estimate token count for text content."""
+# Seconds to wait after a failed tiktoken load before trying again
+ENCODING_RETRY_SECONDS = 60
+
+_encoding = None
+_encoding_failed_at: Optional[float] = None
+
+
+def _get_encoding():
+    """Load the tiktoken encoding, keeping it once loaded; None if unavailable.
+
+    A failed load (e.g. the BPE file download) is retried only after
+    ENCODING_RETRY_SECONDS, since tiktoken's download blocks with no timeout.
+    """
+    global _encoding, _encoding_failed_at
+    if _encoding is not None or not tiktoken:
+        return _encoding
+    if (
+        _encoding_failed_at is not None
+        and time.monotonic() - _encoding_failed_at < ENCODING_RETRY_SECONDS
+    ):
+        return None
     try:
-        import tiktoken
-        encoding = tiktoken.encoding_for_model("gpt-3.5-turbo")
-        return len(encoding.encode(text))
-    except:
-        # Fallback: approximately 4 characters per token
+        _encoding = tiktoken.encoding_for_model("gpt-3.5-turbo")
+        _encoding_failed_at = None
+    except Exception:
+        _encoding_failed_at = time.monotonic()
+        logger.debug("Loading tiktoken encoding failed", exc_info=True)
+    return _encoding
+
+
+# Above this many characters, counting is approximated rather than BPE-encoded
+EXACT_TOKEN_LIMIT = 50_000
+
+
+def _count_tokens(text: str, encoding: Any) -> int:
+    """Count tokens with an already-loaded encoding, approximating when needed."""
+    if encoding is None or len(text) > EXACT_TOKEN_LIMIT:
+        # Approximately 4 characters per token
         return len(text) // 4
+    return len(encoding.encode_ordinary(text))
+
+
+def estimate_tokens(text: str) -> int:
+    """Estimate token count for text content.
+
+    Long documents use the 4-characters-per-token heuristic, since encoding
+    a full transcript just to report a number in the footer is slow.
+    """
+    return _count_tokens(text, _get_encoding())
+
+
+DOC_TEMPLATE = (
+    "# YouTube Video Documentation\n\n"
+    "**Title:** {title}\n\n"
+    "**URL:** {url}\n\n"
+    "**Duration:** {duration}\n\n"
+    "**Views:** {views}\n\n"
+    "**Channel:** {channel}\n\n"
+    "{upload_line}"
+    "---\n\n"
+    "{description_block}"
+    "## Transcript\n\n"
+    "{transcript}\n\n"
+)
+DOC_FOOTER = "---\n\n**Estimated Tokens:** ~{tokens:,}\n"
+
+
+# Fixed DOC_TEMPLATE text with every placeholder empty
+_TEMPLATE_TEXT = DOC_TEMPLATE.format_map(defaultdict(str))
 
 
 def generate_documentation(video_info: Dict[str, Any], transcript: Optional[str]) -> str:
     """Generate markdown documentation from video information and transcript."""
     
-    doc_parts = []
+    view_count = video_info.get('view_count')
+    upload_date = video_info.get('upload_date')
+    description = video_info.get('description')
     
-    # Header
-    doc_parts.append("# YouTube Video Documentation\n\n")
-    doc_parts.append(f"**Title:** {video_info.get('title', 'Unknown')}\n\n")
-    doc_parts.append(f"**URL:** {video_info.get('url', 'Unknown')}\n\n")
-    doc_parts.append(f"**Duration:** {format_duration(video_info.get('duration', 0))}\n\n")
-    doc_parts.append(f"**Views:** {video_info.get('view_count', 'Unknown'):,}\n\n" if video_info.get('view_count') else "**Views:** Unknown\n\n")
-    doc_parts.append(f"**Channel:** {video_info.get('channel', 'Unknown')}\n\n")
-    
-    if video_info.get('upload_date'):
-        doc_parts.append(f"**Upload Date:** {video_info.get('upload_date')}\n\n")
-    
-    doc_parts.append("---\n\n")
-    
-    # Description
-    if video_info.get('description'):
-        doc_parts.append("## Description\n\n")
-        doc_parts.append(f"{video_info['description']}\n\n")
+    fields = {
+        "title": video_info.get('title', 'Unknown'),
+        "url": video_info.get('url', 'Unknown'),
+        "duration": format_duration(video_info.get('duration', 0)),
+        "views": f"{view_count:,}" if view_count else "Unknown",
+        "channel": video_info.get('channel', 'Unknown'),
+        "upload_line": f"**Upload Date:** {upload_date}\n\n" if upload_date else "",
+        "description_block": f"## Description\n\n{description}\n\n" if description else "",
+        "transcript": transcript or "*Transcript not available for this video.*",
+    }
     
-    # Transcript
-    if transcript:
-        doc_parts.append("## Transcript\n\n")
-        doc_parts.append(f"{transcript}\n\n")
+    # BPE is local, so counting sections separately stays within a few tokens
+    # of the full document without re-scanning the joined string
+    encoding = _get_encoding()
+    if encoding is None:
+        # Approximately 4 characters per token, over the whole document
+        estimated_tokens = (len(_TEMPLATE_TEXT) + sum(map(len, fields.values()))) // 4
     else:
-        doc_parts.append("## Transcript\n\n")
-        doc_parts.append("*Transcript not available for this video.*\n\n")
-    
-    # Token estimation
-    content = "".join(doc_parts)
-    estimated_tokens = estimate_tokens(content)
-    doc_parts.append("---\n\n")
-    doc_parts.append(f"**Estimated Tokens:** {estimated_tokens:,}\n")
+        estimated_tokens = _count_tokens(_TEMPLATE_TEXT, encoding) + sum(
+            _count_tokens(v, encoding) for v in fields.values()
+        )
     
-    return "".join(doc_parts)
+    return DOC_TEMPLATE.format_map(fields) + DOC_FOOTER.format(tokens=estimated_tokens)
 
 
 async def process_youtube_video(url: str) -> Tuple[Dict[str, Any], str]:
@@ -209,11 +466,20 @@ async def process_youtube_video(url: str) -> Tuple[Dict[str, Any], str]:
     # Extract video ID
     video_id = extract_video_id(url)
     
-    # Get video information
-    video_info = await get_video_info(video_id, url)
+    # Get video information and transcript concurrently
+    video_info, transcript = await asyncio.gather(
+        get_video_info(video_id, url),
+        get_transcript(video_id),
+        return_exceptions=True,
+    )
+    
+    if isinstance(video_info, BaseException):
+        raise video_info
     
-    # Get transcript
-    transcript = await get_transcript(video_id)
+    # A failed transcript fetch should not discard the video info
+    if isinstance(transcript, BaseException):
+        logger.debug("Transcript task failed for %s", video_id, exc_info=transcript)
+        transcript = None
     
     # Generate documentation
     documentation = generate_documentation(video_info, transcript)